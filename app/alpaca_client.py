@@ -8,35 +8,65 @@ from alpaca.trading.requests import GetAssetsRequest
 from alpaca.trading.enums import AssetClass, AssetStatus
 from alpaca.common.exceptions import APIError
 from alpaca.common.enums import Sort
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
 import time
 import os
-import sys
+import numpy as np
 import pandas as pd
 import pytz
-from typing import Optional
-from config_local import API_KEY, API_SECRET, BASE_URL, BASE_DATA_DIR, MAX_RETRIES, RETRY_DELAY, CHUNK_DAYS, NY_TZ
-from app.utils import ensure_tz_aware
-from app.data_handler import save_bars_to_csv
+from typing import Dict, List, Optional
+from config_local import API_KEY, API_SECRET, BASE_DATA_DIR, MAX_RETRIES, RETRY_DELAY, CHUNK_DAYS, NY_TZ
+from app.config import DOWNLOAD_WORKERS, REQUESTS_PER_MINUTE, SYMBOLS_PER_REQUEST
+from app.rate_limiter import RateLimiter, RateLimitedAdapter, retry_after_seconds
+from app.data_handler import save_bars_to_csv, compact_bars_csv
 
-_data_connected_once = False
+# Clients are created on first use and shared, so their HTTP sessions (and open connections) are reused
+_trading_client: Optional[TradingClient] = None
+_data_client: Optional[StockHistoricalDataClient] = None
+_client_lock = threading.Lock()  # download threads may ask for a client at the same time
+
+# How often download_all_symbols writes its state file: every N finished chunks or N seconds, whichever comes first
+CHECKPOINT_EVERY = 100
+CHECKPOINT_SECONDS = 30
+
+# Shared by every data client so all download threads draw from the same request budget
+_rate_limiter = RateLimiter(requests_per_minute=REQUESTS_PER_MINUTE, max_concurrency=DOWNLOAD_WORKERS)
+
+# Keep-alive connections per host; must be at least the number of download threads or connections get dropped
+HTTP_POOL_SIZE = max(50, DOWNLOAD_WORKERS)
+
+def _pool_kwargs() -> dict:
+    """HTTPAdapter settings that reuse TCP/TLS connections (alpaca-py does its own retries)."""
+    return dict(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=Retry(total=0))
 
 def connect_trading():
-    """Connect to Alpaca trading API."""
-    client = TradingClient(API_KEY, API_SECRET, paper=True)
-    print("✅ Connected to Alpaca Trading API")
-    return client
+    """Connect to Alpaca trading API (the client is created once and reused)."""
+    global _trading_client
+
+    with _client_lock:
+        if _trading_client is None:
+            client = TradingClient(API_KEY, API_SECRET, paper=True)
+            client._session.mount("https://", HTTPAdapter(**_pool_kwargs()))
+            print("✅ Connected to Alpaca Trading API")
+            _trading_client = client
+    return _trading_client
 
 def connect_data():
-    """Connect to Alpaca market data API."""
-    global _data_connected_once  # tell Python we're using the global flag
+    """Connect to Alpaca market data API (the client is created once and reused)."""
+    global _data_client
 
-    client = StockHistoricalDataClient(API_KEY, API_SECRET)
-    if not _data_connected_once:
-        print("✅ Connected to Alpaca Market Data API")
-        _data_connected_once = True
-    return client
+    with _client_lock:
+        if _data_client is None:
+            client = StockHistoricalDataClient(API_KEY, API_SECRET)
+            client._session.mount("https://", RateLimitedAdapter(_rate_limiter, **_pool_kwargs()))
+            print("✅ Connected to Alpaca Market Data API")
+            _data_client = client
+    return _data_client
 
 def get_recent_bars(symbol: str, days: int = 1):
     """Fetch recent daily bars for a symbol."""
@@ -54,6 +84,9 @@ def get_recent_bars(symbol: str, days: int = 1):
     bars = data_client.get_stock_bars(request)
     return bars
 
+ASSET_COLUMNS = ['symbol', 'name', 'exchange', 'asset_class', 'status', 'tradable',
+                 'marginable', 'shortable', 'easy_to_borrow', 'fractionable']
+
 def get_tradeable_symbols_df(
     trading_client: TradingClient,
     asset_class: Optional[AssetClass] = AssetClass.US_EQUITY,
@@ -106,33 +139,21 @@ def get_tradeable_symbols_df(
         # Get all assets
         assets = trading_client.get_all_assets(search_params)
         
-        # Convert to list of dictionaries
-        asset_data = []
-        for asset in assets:
-            # Apply additional filters if specified
-            if tradable and not asset.tradable:
-                continue
-            if shortable is not None and asset.shortable != shortable:
-                continue
-            if fractionable is not None and asset.fractionable != fractionable:
-                continue
-                
-            asset_dict = {
-                'symbol': asset.symbol,
-                'name': asset.name,
-                'exchange': asset.exchange.value if asset.exchange else None,
-                'asset_class': asset.asset_class.value,
-                'status': asset.status.value,
-                'tradable': asset.tradable,
-                'marginable': asset.marginable,
-                'shortable': asset.shortable,
-                'easy_to_borrow': asset.easy_to_borrow,
-                'fractionable': asset.fractionable
-            }
-            asset_data.append(asset_dict)
-        
-        # Create DataFrame
-        df = pd.DataFrame(asset_data)
+        # Build the DataFrame in one go, then filter with boolean masks
+        df = pd.DataFrame.from_records((vars(asset) for asset in assets), columns=ASSET_COLUMNS)
+
+        # Enums → plain strings, once per column (newer pandas already stores these str-enums as strings).
+        # Done before filtering so columns are only ever set on this frame, never on a filtered slice of it
+        for col in ('exchange', 'asset_class', 'status'):
+            df[col] = df[col].map(lambda e: getattr(e, 'value', e))
+
+        # Apply additional filters if specified
+        if tradable:
+            df = df[df['tradable'].astype(bool)]
+        if shortable is not None:
+            df = df[df['shortable'] == shortable]
+        if fractionable is not None:
+            df = df[df['fractionable'] == fractionable]
         
         # Sort by symbol for easier viewing
         if not df.empty:
@@ -176,6 +197,14 @@ def fetch_1min_bars(symbol, start: datetime, end: datetime, limit=10000) -> pd.D
     Fetch all 1-minute bars for a symbol in the specified range using pagination.
     Returns a DataFrame with timestamp as index.
     """
+    return fetch_1min_bars_batch([symbol], start, end).get(symbol, pd.DataFrame())
+
+def fetch_1min_bars_batch(symbols: List[str], start: datetime, end: datetime) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch all 1-minute bars for several symbols in the specified range, one multi-symbol
+    request per 30 days (alpaca-py follows the pagination).
+    Returns {symbol: DataFrame with NY-time timestamp as index}; symbols without bars are left out.
+    """
     data_client = connect_data()
 
     all_bars = []
@@ -186,32 +215,37 @@ def fetch_1min_bars(symbol, start: datetime, end: datetime, limit=10000) -> pd.D
         current_end = min(current_start + timedelta(days=APIrequestDaysSize), end)  # fetch max 30 days per request
         try:
             request_params = StockBarsRequest(
-                symbol_or_symbols=symbol,
+                symbol_or_symbols=symbols,
                 timeframe=TimeFrame.Minute,
                 start=current_start,
                 end=current_end,
                 adjustment="split"  # adjust for splits
             )
             bars = data_client.get_stock_bars(request_params)
-            df = bars.df.copy() if bars else pd.DataFrame()
+            df = bars.df if bars else pd.DataFrame()  # .df builds a fresh frame, no need to copy it
             if not df.empty:
                 all_bars.append(df)
             current_start = current_end  # move to next chunk
         except Exception as e:
-            print(f"Error fetching {symbol} from {current_start} to {current_end}: {e}")
+            print(f"Error fetching {', '.join(symbols)} from {current_start} to {current_end}: {e}")
             raise  # stop on error to retry later
-    if all_bars:
-        full_df = pd.concat(all_bars).sort_index()
-        # Remove duplicates if any
-        full_df = full_df[~full_df.index.duplicated(keep='first')]
-        return full_df
-    return pd.DataFrame()
+    if not all_bars:
+        return {}
+
+    # Chunks were fetched oldest → newest, so each symbol's rows are already in time order
+    full_df = pd.concat(all_bars)
+    # Remove duplicates if any
+    full_df = full_df[~full_df.index.duplicated(keep='first')]
+    # Convert to NY time once for the whole batch; converting the level's unique values is cheaper than every row per symbol
+    level = full_df.index.names.index('timestamp')
+    full_df.index = full_df.index.set_levels(full_df.index.levels[level].tz_convert(NY_TZ), level=level)
+    return {symbol: group.droplevel('symbol') for symbol, group in full_df.groupby(level='symbol', sort=False)}
 
 def fetch_oldest_bar_date(symbol: str) -> pd.Timestamp:
     """
     Query Alpaca for the *earliest available* daily bar for `symbol`.
-    Returns a tz-aware (NY) pd.Timestamp at the *bar's timestamp* (not just date).
-    If not found or error, returns pd.NaT.
+    Returns the bar's timestamp as the API gives it (tz-aware UTC); callers convert
+    many of these to NY time at once. If not found or error, returns pd.NaT.
     """
     try:
         data_client = connect_data()
@@ -225,16 +259,14 @@ def fetch_oldest_bar_date(symbol: str) -> pd.Timestamp:
             sort=Sort.ASC
         )
         bars = data_client.get_stock_bars(req)
-        if bars and not bars.df.empty:
-            df = bars.df.copy()
+        df = bars.df if bars else pd.DataFrame()  # .df rebuilds the frame on every access, so read it once
+        if not df.empty:
             # df index is usually MultiIndex (symbol, timestamp) → take timestamp level
             if isinstance(df.index, pd.MultiIndex):
                 ts = df.index.get_level_values('timestamp')[0]
             else:
                 ts = df.index[0]
-            # Convert to NY tz
-            ts = pd.Timestamp(ts).tz_convert(NY_TZ)
-            return ts
+            return pd.Timestamp(ts)
     except Exception as e:
         print(f"[WARN] API error fetching oldest date for {symbol}: {e}")
     return pd.NaT
@@ -242,31 +274,24 @@ def fetch_oldest_bar_date(symbol: str) -> pd.Timestamp:
 def download_all_symbols(trading_client, symbols_df: pd.DataFrame):
     """
     Downloads 1-minute bars for all symbols in sync (most recent backwards),
+    requesting up to SYMBOLS_PER_REQUEST symbols per API call and running
+    DOWNLOAD_WORKERS calls at the same time.
     """
     # Ensure directories exist
     os.makedirs(BASE_DATA_DIR, exist_ok=True)
     DATA_DIR = os.path.join(BASE_DATA_DIR, "1mintrades")
     os.makedirs(DATA_DIR, exist_ok=True)
-    STATE_FILE = os.path.join(BASE_DATA_DIR, "download_state.csv")
+    STATE_FILE = os.path.join(BASE_DATA_DIR, "download_state.parquet")
+    LEGACY_STATE_FILE = os.path.join(BASE_DATA_DIR, "download_state.csv")  # state format before parquet
+    OLDEST_DATE_CACHE = os.path.join(BASE_DATA_DIR, "oldest_dates.parquet")
 
     # Load or init state
     if os.path.exists(STATE_FILE):
-        state = pd.read_csv(STATE_FILE, index_col='symbol')
-
-        # Parse to UTC (handles mixed/naive tz safely), then convert to NY time
-        state['last_end'] = pd.to_datetime(state['last_end'], errors='coerce', utc=True)\
-                            .dt.tz_convert(NY_TZ)
-
-        # If oldest_date is date-only or mixed tz, do the same; .normalize() -> midnight NY
-        if 'oldest_date' not in state.columns:
-            state['oldest_date'] = pd.Series(pd.NaT, dtype="datetime64[ns, America/New_York]")
-        else:
-            state['oldest_date'] = pd.to_datetime(state['oldest_date'], errors='coerce', utc=True).dt.tz_convert(NY_TZ)
-
-
-        # 'complete' column fallback
-        if 'complete' not in state.columns:
-            state['complete'] = False
+        state = pd.read_parquet(STATE_FILE)
+    elif os.path.exists(LEGACY_STATE_FILE):
+        # The CSV state was written with an unnamed index, so its first column has no header
+        state = pd.read_csv(LEGACY_STATE_FILE, index_col=0, engine='pyarrow')
+        state.index.name = 'symbol'
     else:
         # fresh state
         state = pd.DataFrame(index=symbols_df['symbol'].tolist())
@@ -301,122 +326,201 @@ def download_all_symbols(trading_client, symbols_df: pd.DataFrame):
         if col not in state.columns:
             state[col] = default
 
-    # 4) add missing symbols to state with defaults
-    missing = [s for s in symbols if s not in state.index]
-    if missing:
-        new_rows = pd.DataFrame({
-            'last_end': pd.NaT,
-            'oldest_date': pd.NaT,
-            'complete': False
-        }, index=pd.Index(missing, name='symbol'))
-        state = pd.concat([state, new_rows], axis=0)
-
-    # 5) optional: sort & de-dup the index
-    state = state[~state.index.duplicated(keep='first')].sort_index()
-
-    # 6) persist immediately (two writes; leave .tmp)
-    tmp = STATE_FILE + ".tmp"
-
-    # write tmp with fsync
-    with open(tmp, "w", newline="", encoding="utf-8") as f:
-        state.to_csv(f)
-        f.flush()
-        os.fsync(f.fileno())
+    # 4) de-dup the index
+    state = state[~state.index.duplicated(keep='first')]
 
-    # write final (no fsync)
-    state.to_csv(STATE_FILE)
-        
+    # 5) add missing symbols and sort in one step; new rows get NaT dates and a missing 'complete', filled below
+    state = state.reindex(state.index.union(pd.Index(symbols)))
+    state.index.name = 'symbol'
 
-    # Fill missing oldest_date via API, once
-    oldestDateAPICallCounter = 0
-    for symbol in symbols:  # <-- use normalized list
-        if symbol not in state.index:
-            # belt & suspenders — should be covered by your align step
-            state.loc[symbol, ['last_end','oldest_date','complete']] = [pd.NaT, pd.NaT, False]
+    # 6) dates as tz-aware NY time (a no-op for parquet state; parses the legacy CSV and fresh rows), 'complete' as bool.
+    #    Always ns resolution: the download loop writes chunk boundaries (with microseconds) into these columns' arrays,
+    #    which fails on a column parsed at a coarser unit such as seconds
+    for col in ('last_end', 'oldest_date'):
+        state[col] = pd.to_datetime(state[col], errors='coerce', utc=True).dt.tz_convert(NY_TZ).dt.as_unit('ns')
+    state['complete'] = state['complete'].eq(True)  # rows added by the reindex hold NaN; no fillna downcast needed
 
-        if pd.isna(state.loc[symbol, 'oldest_date']):
-            try:
-                api_oldest_ts = fetch_oldest_bar_date(symbol)
-                if pd.notna(api_oldest_ts):
-                    state.loc[symbol, 'oldest_date'] = api_oldest_ts.tz_convert(NY_TZ).normalize()
-                print(f"[INFO] Oldest date for {symbol}: {state.loc[symbol, 'oldest_date']}")
-                oldestDateAPICallCounter += 1
-                if oldestDateAPICallCounter % 100 == 0:
-                    print(f"[INFO] Fetched oldest date for {oldestDateAPICallCounter} symbols so far, updating STATE_FILE")
-                    state.to_csv(STATE_FILE)
-            except Exception as e:
-                print(f"[WARN] Failed to fetch oldest date for {symbol}: {e}")
+    # 7) persist immediately
+    _save_parquet(state, STATE_FILE)
 
-                
+    # A symbol's first bar never changes, so oldest dates are also kept in a cache that outlives the state file
+    if os.path.exists(OLDEST_DATE_CACHE):
+        oldest_cache = pd.read_parquet(OLDEST_DATE_CACHE)['oldest_date'].dt.tz_convert(NY_TZ)
+        state['oldest_date'] = state['oldest_date'].fillna(oldest_cache.reindex(state.index))
+    else:
+        oldest_cache = pd.Series(dtype=f"datetime64[ns, {NY_TZ}]", name='oldest_date')
 
+    # Fill missing oldest_date via API, once; DOWNLOAD_WORKERS requests at a time, saving state every CHECKPOINT_EVERY symbols
+    missing_symbols = state.index[state['oldest_date'].isna() & state.index.isin(symbols)].tolist()
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        for i in range(0, len(missing_symbols), CHECKPOINT_EVERY):
+            batch = missing_symbols[i:i + CHECKPOINT_EVERY]
+            raw = pd.Series(dict(zip(batch, executor.map(fetch_oldest_bar_date, batch)))).dropna()
 
-    # Save state atomically
-    tmp = STATE_FILE + ".tmp"
-    state.to_csv(tmp)
-    state.to_csv(STATE_FILE)
+            # Convert the whole batch to NY dates in one go
+            if not raw.empty:
+                state.loc[raw.index, 'oldest_date'] = pd.to_datetime(raw, utc=True).dt.tz_convert(NY_TZ).dt.normalize()
 
+            print(f"[INFO] Fetched oldest date for {i + len(batch)}/{len(missing_symbols)} symbols so far, updating STATE_FILE")
+            _save_parquet(state, STATE_FILE)
 
-    symbols_remaining = set(state.index[state['complete'] == False])
-    now = pd.Timestamp.now(tz=NY_TZ) - timedelta(days=1)  # one-day buffer
+    # Add what we learned (from the API or an older state file) to the cache; it only ever grows
+    known_oldest = state['oldest_date'].dropna().combine_first(oldest_cache)
+    if len(known_oldest) > len(oldest_cache):
+        _save_parquet(known_oldest.rename('oldest_date').rename_axis('symbol').to_frame(), OLDEST_DATE_CACHE)
 
-    while symbols_remaining:
-        for symbol in list(symbols_remaining):
-            oldest_date = state.loc[symbol, 'oldest_date']
-            last_end = state.loc[symbol, 'last_end']
-
-            # Determine end_date boundary (move backward)
-            end_date = now if pd.isna(last_end) else last_end
-
-            # Determine start_date = max(oldest_date, end_date - CHUNK_DAYS)
-            start_date = end_date - timedelta(days=CHUNK_DAYS)
-            if pd.notna(oldest_date) and start_date < oldest_date:
-                start_date = oldest_date
-
-            # Already complete?
-            if pd.notna(oldest_date) and start_date >= end_date:
-                print(f"[DONE] {symbol} — all data fetched.")
-                state.loc[symbol, 'complete'] = True
-                symbols_remaining.remove(symbol)
-                continue
-
-            retries = 0
-            while retries < MAX_RETRIES:
-                try:
-                    print(f"[FETCH] {symbol} from {start_date} to {end_date}")
-                    # IMPORTANT: Correct call signature (no trading_client as first arg)
-                    bars_df = fetch_1min_bars(symbol, start=start_date, end=end_date)
-
-                    if bars_df.empty:
-                           # Only mark complete when we've reached or crossed the oldest boundary
-                            if pd.notna(oldest_date) and (start_date <= oldest_date):
-                                print(f"[INFO] No more bars for {symbol}; marking complete.")
-                                state.loc[symbol, 'complete'] = True
-                                symbols_remaining.remove(symbol)
-                            else:
-                                print(f"[INFO] No bars returned for {symbol} in this chunk; keeping symbol active (likely data gap or temp issue).")
+    now = pd.Timestamp.now(tz=NY_TZ) - timedelta(days=1)  # one-day buffer
+    unsaved_results = 0
+    last_checkpoint = time.monotonic()
+
+    # Symbols whose boundary already reached their oldest bar (e.g. stopped right before being marked) are done;
+    # mark them all at once and save before any work is scheduled
+    end_dates = state['last_end'].fillna(now)
+    already_done = ~state['complete'] & (end_dates <= state['oldest_date'])
+    if already_done.any():
+        for symbol in state.index[already_done]:
+            print(f"[DONE] {symbol} — all data fetched.")
+            compact_bars_csv(symbol, DATA_DIR)
+        state.loc[already_done, 'complete'] = True
+        _save_parquet(state, STATE_FILE)
+
+    # The loop below reads and writes these arrays by position instead of looking symbols up in `state`;
+    # they're copied back into `state` only when it's saved
+    symbol_names = state.index.to_numpy()
+    oldest_arr = state['oldest_date'].array
+    last_end_arr = state['last_end'].array.copy()
+    complete_arr = state['complete'].to_numpy(copy=True)
+    request_alone = np.zeros(len(state), dtype=bool)  # set for symbols whose batch request failed; fetched on their own from then on
+
+    # First window for every unfinished symbol: start_date = max(oldest_date, end_date - CHUNK_DAYS)
+    pending = np.flatnonzero(~complete_arr)
+    end_dates = end_dates.iloc[pending]
+    oldest_dates = state['oldest_date'].iloc[pending]
+    start_dates = end_dates - timedelta(days=CHUNK_DAYS)
+    start_dates = start_dates.mask(oldest_dates > start_dates, oldest_dates)
+
+    windows = {}  # (start_date, end_date) -> [position, ...]
+    for i, start_date, end_date in zip(pending, start_dates, end_dates):
+        windows.setdefault((start_date, end_date), []).append(i)
+
+    # Workers only fetch and write their own symbols' CSVs; all state updates stay on this thread.
+    # When a request finishes, its symbols' next (older) window is queued behind everything already
+    # waiting, so all symbols still move back together without waiting for the slowest one each round.
+    executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+    jobs = {}  # future -> (batch, start_date, end_date)
+    try:
+        _submit_windows(executor, jobs, windows, symbol_names, request_alone, DATA_DIR)
+
+        while jobs:
+            finished, _ = wait(jobs, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch, start_date, end_date = jobs.pop(future)
+                bar_counts = future.result()
+                next_windows = {}
+
+                if bar_counts is None and len(batch) > 1:
+                    # One bad symbol can fail a whole request; retry these one by one
+                    print(f"[WARN] Batch request failed for {', '.join(symbol_names[batch])}; requesting them individually.")
+                    request_alone[batch] = True
+                    next_windows[(start_date, end_date)] = batch
+                    batch = []
+
+                for i in batch:
+                    symbol = symbol_names[i]
+                    oldest_date = oldest_arr[i]
+                    if bar_counts is None:
+                        print(f"[FATAL] Skipping {symbol} after {MAX_RETRIES} retries.")
+                        continue
+
+                    if bar_counts.get(symbol, 0) == 0:
+                        # Only mark complete when we've reached or crossed the oldest boundary
+                        if pd.notna(oldest_date) and (start_date <= oldest_date):
+                            print(f"[INFO] No more bars for {symbol}; marking complete.")
+                            complete_arr[i] = True
+                            compact_bars_csv(symbol, DATA_DIR)
+                        else:
+                            print(f"[INFO] No bars returned for {symbol} in this chunk; keeping symbol active (likely data gap or temp issue).")
                             # Do NOT advance last_end on an empty result
-                            tmp = STATE_FILE + ".tmp"
-                            state.to_csv(tmp)
-                            state.to_csv(STATE_FILE)
-                            break
-
-                    save_bars_to_csv(bars_df, symbol, DATA_DIR)
+                            next_windows.setdefault((start_date, end_date), []).append(i)
+                    else:
+                        # Move boundary older by one chunk and queue the next, older chunk
+                        last_end_arr[i] = start_date
+                        next_start = start_date - timedelta(days=CHUNK_DAYS)
+                        if pd.notna(oldest_date) and next_start < oldest_date:
+                            next_start = oldest_date
+
+                        if pd.notna(oldest_date) and next_start >= start_date:
+                            print(f"[DONE] {symbol} — all data fetched.")
+                            complete_arr[i] = True
+                            compact_bars_csv(symbol, DATA_DIR)
+                        else:
+                            next_windows.setdefault((next_start, start_date), []).append(i)
+
+                    # Checkpoint every CHECKPOINT_EVERY results or CHECKPOINT_SECONDS, not after each one
+                    unsaved_results += 1
+                    if unsaved_results >= CHECKPOINT_EVERY or time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+                        _save_state(state, last_end_arr, complete_arr, STATE_FILE)
+                        unsaved_results = 0
+                        last_checkpoint = time.monotonic()
+
+                _submit_windows(executor, jobs, next_windows, symbol_names, request_alone, DATA_DIR)
+    finally:
+        # On Ctrl+C don't wait for the chunks still queued; then save what finished so it isn't downloaded again
+        executor.shutdown(cancel_futures=True)
+        _save_state(state, last_end_arr, complete_arr, STATE_FILE)
+
+
+def _submit_windows(executor: ThreadPoolExecutor, jobs: dict, windows: dict, symbol_names, request_alone: np.ndarray, data_dir: str):
+    """
+    Queue download jobs for `windows` ({(start_date, end_date): [position in symbol_names, ...]}).
+    Symbols sharing a window go SYMBOLS_PER_REQUEST to a request, except those flagged in `request_alone`.
+    """
+    for (start_date, end_date), members in windows.items():
+        together = [i for i in members if not request_alone[i]]
+        batches = [together[j:j + SYMBOLS_PER_REQUEST] for j in range(0, len(together), SYMBOLS_PER_REQUEST)]
+        batches += [[i] for i in members if request_alone[i]]
+        for batch in batches:
+            future = executor.submit(_download_chunk, symbol_names[batch].tolist(), start_date, end_date, data_dir)
+            jobs[future] = (batch, start_date, end_date)
+
+
+def _save_parquet(df: pd.DataFrame, path: str):
+    """Write `df` to a temp file, then swap it in so a crash never leaves a half-written file."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        df.to_parquet(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
 
-                    # Move boundary older by one chunk: next loop will fetch further back
-                    state.loc[symbol, 'last_end'] = start_date
 
-                    # Save state atomically after each success
-                    tmp = STATE_FILE + ".tmp"
-                    state.to_csv(tmp)
-                    state.to_csv(STATE_FILE)
-                    break
+def _save_state(state: pd.DataFrame, last_end_arr, complete_arr, path: str):
+    """Copy the arrays download_all_symbols works on back into `state`, then save it."""
+    state['last_end'] = last_end_arr.copy()
+    state['complete'] = complete_arr.copy()
+    _save_parquet(state, path)
 
-                except (RequestException, APIError, ConnectionError) as e:
-                    retries += 1
-                    wait_time = RETRY_DELAY * retries
-                    print(f"[ERROR] {symbol}: {e} — retry {retries}/{MAX_RETRIES} in {wait_time}s...")
-                    time.sleep(wait_time)
 
-            else:
-                print(f"[FATAL] Skipping {symbol} after {MAX_RETRIES} retries.")
-                symbols_remaining.remove(symbol)
\ No newline at end of file
+def _download_chunk(symbols: List[str], start_date, end_date, data_dir: str) -> Optional[Dict[str, int]]:
+    """
+    Fetch one chunk of 1-minute bars for `symbols` (one request) and append it to each symbol's CSV.
+    Runs on a worker thread of download_all_symbols.
+    Returns {symbol: number of bars saved} (symbols without bars are left out), or None if all retries failed.
+    """
+    label = ', '.join(symbols)
+    retries = 0
+    while retries < MAX_RETRIES:
+        try:
+            print(f"[FETCH] {label} from {start_date} to {end_date}")
+            bars_by_symbol = fetch_1min_bars_batch(symbols, start=start_date, end=end_date)
+            for symbol, bars_df in bars_by_symbol.items():
+                save_bars_to_csv(bars_df, symbol, data_dir)
+            return {symbol: len(bars_df) for symbol, bars_df in bars_by_symbol.items()}
+
+        except (RequestException, APIError, ConnectionError) as e:
+            retries += 1
+            wait_time = retry_after_seconds(e, default=RETRY_DELAY * retries)
+            print(f"[ERROR] {label}: {e} — retry {retries}/{MAX_RETRIES} in {wait_time}s...")
+            time.sleep(wait_time)
+
+    return None
@@ -1 +1,7 @@
-# Loads environment variables or config files
\ No newline at end of file
+# Loads environment variables or config files
+import config_local
+
+# Optional settings - older config_local.py files may not define these, so fall back to defaults
+DOWNLOAD_WORKERS = getattr(config_local, "DOWNLOAD_WORKERS", 8)
+REQUESTS_PER_MINUTE = getattr(config_local, "REQUESTS_PER_MINUTE", 200)
+SYMBOLS_PER_REQUEST = getattr(config_local, "SYMBOLS_PER_REQUEST", 10)
@@ -1,12 +1,44 @@
+import importlib.util
+import logging
+import numpy as np
 import pandas as pd
 import os
-from typing import Optional, List, Union
-from datetime import datetime, timedelta
+from typing import Iterator, Optional, List, Union
 from zoneinfo import ZoneInfo
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Parquet files and the opt-in pyarrow CSV parser need pyarrow; without it DataHandler uses CSV and the C parser
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
 
 NY_TZ = ZoneInfo("America/New_York")
 
+# Per-file messages are logged at DEBUG so downloading thousands of symbols doesn't flood the console
+logger = logging.getLogger(__name__)
+
+
+# Files that mark the project root (where main.py is located)
+_ROOT_MARKERS = frozenset({'main.py', 'setup.py', '.git', 'requirements.txt', 'pyproject.toml', 'README.md'})
+
+
+@lru_cache(maxsize=None)
+def _find_root(start: Path) -> Path:
+    """
+    First directory from `start` upwards that contains a project marker, found once per process.
+    Lists each directory once with os.scandir instead of checking every marker with its own stat call.
+    """
+    for directory in (start, *start.parents):
+        try:
+            with os.scandir(directory) as entries:
+                if any(entry.name in _ROOT_MARKERS for entry in entries):
+                    return directory
+        except OSError:
+            continue  # unreadable directory, keep going up
+    
+    # Fallback to parent directory of this module
+    return Path(__file__).parent.parent
+
 
 class DataHandler:
     """
@@ -23,32 +55,11 @@ class DataHandler:
         data_folder : str
             The folder where CSV files are stored (relative to project root)
         """
-        # Get the project root directory (where main.py is located)
-        # This ensures consistent relative paths regardless of where the script is run from
-        if __name__ == "__main__":
-            # If running this file directly
-            project_root = Path(__file__).parent.parent
-        else:
-            # If imported from another module
-            # Look for main.py or setup.py to identify project root
-            current_dir = Path(__file__).parent
-            project_root = current_dir.parent
-            
-            # Alternative: try to find project root by looking for common project files
-            while project_root != project_root.parent:
-                if any((project_root / marker).exists() for marker in ['main.py', 'setup.py', '.git', 'requirements.txt']):
-                    break
-                project_root = project_root.parent
-            else:
-                # Fallback to parent directory of this module
-                project_root = Path(__file__).parent.parent
+        self.project_root = get_project_root()
+        self.data_folder = self.project_root / data_folder  # created on first save
         
-        self.project_root = project_root
-        self.data_folder = project_root / data_folder
-        self.data_folder.mkdir(exist_ok=True)  # Create folder if it doesn't exist
-        
-        print(f"📁 Project root: {self.project_root}")
-        print(f"📁 Data folder: {self.data_folder}")
+        logger.debug("📁 Project root: %s", self.project_root)
+        logger.debug("📁 Data folder: %s", self.data_folder)
     
     def load_csv(
         self, 
@@ -56,15 +67,18 @@ class DataHandler:
         encoding: str = 'utf-8',
         parse_dates: Optional[List[str]] = None,
         date_parser: Optional[str] = None,
-        index_col: Optional[Union[str, int]] = None
-    ) -> pd.DataFrame:
+        index_col: Optional[Union[str, int]] = None,
+        file_format: str = 'csv',
+        engine: str = 'c',
+        chunksize: Optional[int] = None
+    ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
         """
-        Load a CSV file and return as pandas DataFrame.
+        Load a CSV (or parquet) file and return as pandas DataFrame.
         
         Parameters:
         -----------
         filename : str
-            Name of the CSV file (with or without .csv extension)
+            Name of the file (with or without .csv/.parquet extension)
         encoding : str, optional
             File encoding (default: 'utf-8')
         parse_dates : List[str], optional
@@ -73,28 +87,42 @@ class DataHandler:
             Date format string (e.g., '%Y-%m-%d')
         index_col : str or int, optional
             Column to use as index
+        file_format : str, optional
+            'csv' (default) or 'parquet'; parquet needs pyarrow and falls back to CSV without it.
+            Parquet keeps column types, so encoding/parse_dates/date_parser don't apply.
+        engine : str, optional
+            CSV parser passed to pandas (default: 'c'). 'pyarrow' parses multi-threaded but infers its own
+            types (ISO date/time columns as Python dates/times, offsets converted to UTC), so it is opt-in.
+        chunksize : int, optional
+            Read the CSV `chunksize` rows at a time instead of all at once (default: None).
+            Useful for large files that only need to be filtered or summarized; uses the C parser.
         
         Returns:
         --------
-        pd.DataFrame
-            The loaded DataFrame
+        pd.DataFrame or Iterator[pd.DataFrame]
+            The loaded DataFrame, or an iterator of DataFrames when chunksize is set
         """
         try:
-            # Add .csv extension if not present
-            if not filename.endswith('.csv'):
-                filename += '.csv'
-            
+            filename, file_format = self._with_extension(filename, file_format)
             file_path = self.data_folder / filename
             
             # Check if file exists
             if not file_path.exists():
-                print(f"❌ File not found: {file_path}")
+                logger.error("❌ File not found: %s", file_path)
                 return pd.DataFrame()
             
+            if file_format == 'parquet':
+                df = pd.read_parquet(file_path)
+                if index_col is not None:
+                    df = df.set_index(df.columns[index_col] if isinstance(index_col, int) else index_col)
+                logger.debug("✅ Successfully loaded %s, shape %s", filename, df.shape)
+                return df
+            
             # Load CSV with various options
             kwargs = {
                 'encoding': encoding,
-                'index_col': index_col
+                'index_col': index_col,
+                'engine': engine if (engine != 'pyarrow' or _HAS_PYARROW) else 'c'
             }
             
             # Handle date parsing
@@ -103,16 +131,27 @@ class DataHandler:
                 if date_parser:
                     kwargs['date_format'] = date_parser
             
+            # Low-memory mode: hand back an iterator of chunks (the pyarrow parser can't stream)
+            if chunksize and kwargs['engine'] == 'pyarrow':
+                kwargs['engine'] = 'c'
+            
+            # The C parser reads straight from a memory-mapped file instead of through read() calls
+            if kwargs['engine'] == 'c':
+                kwargs['memory_map'] = True
+            
+            if chunksize:
+                reader = pd.read_csv(file_path, chunksize=chunksize, **kwargs)
+                logger.debug("✅ Reading %s in chunks of %d rows", filename, chunksize)
+                return reader
+            
             df = pd.read_csv(file_path, **kwargs)
             
-            print(f"✅ Successfully loaded {filename}")
-            print(f"   Shape: {df.shape}")
-            print(f"   Columns: {list(df.columns)}")
+            logger.debug("✅ Successfully loaded %s, shape %s, columns %s", filename, df.shape, list(df.columns))
             
             return df
             
         except Exception as e:
-            print(f"❌ Error loading {filename}: {e}")
+            logger.error("❌ Error loading %s: %s", filename, e)
             return pd.DataFrame()
     
     def save_csv(
@@ -120,21 +159,24 @@ class DataHandler:
         df: pd.DataFrame, 
         filename: str, 
         index: bool = False,
-        encoding: str = 'utf-8'
+        encoding: str = 'utf-8',
+        file_format: str = 'csv'
     ) -> bool:
         """
-        Save DataFrame to CSV file.
+        Save DataFrame to CSV (or parquet) file.
         
         Parameters:
         -----------
         df : pd.DataFrame
             DataFrame to save
         filename : str
-            Name of the CSV file (with or without .csv extension)
+            Name of the file (with or without .csv/.parquet extension)
         index : bool, optional
             Whether to include index in saved file (default: False)
         encoding : str, optional
-            File encoding (default: 'utf-8')
+            File encoding (default: 'utf-8'; CSV only)
+        file_format : str, optional
+            'csv' (default) or 'parquet' (zstd-compressed); parquet needs pyarrow and falls back to CSV without it
         
         Returns:
         --------
@@ -142,23 +184,39 @@ class DataHandler:
             True if successful, False otherwise
         """
         try:
-            # Add .csv extension if not present
-            if not filename.endswith('.csv'):
-                filename += '.csv'
-            
+            filename, file_format = self._with_extension(filename, file_format)
+            self.data_folder.mkdir(parents=True, exist_ok=True)  # Create folder (and parents) if it doesn't exist
             file_path = self.data_folder / filename
             
-            df.to_csv(file_path, index=index, encoding=encoding)
+            if file_format == 'parquet':
+                df.to_parquet(file_path, index=index, compression='zstd')
+            else:
+                df.to_csv(file_path, index=index, encoding=encoding)
             
-            print(f"✅ Successfully saved {filename}")
-            print(f"   Shape: {df.shape}")
+            logger.debug("✅ Successfully saved %s, shape %s", filename, df.shape)
             
             return True
             
         except Exception as e:
-            print(f"❌ Error saving {filename}: {e}")
+            logger.error("❌ Error saving %s: %s", filename, e)
             return False
     
+    @staticmethod
+    def _with_extension(filename: str, file_format: str):
+        """Return (filename with the right extension, format actually used)."""
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unknown file_format: {file_format!r} (expected 'csv' or 'parquet')")
+        if file_format == 'parquet' and not _HAS_PYARROW:
+            logger.warning("⚠️ pyarrow is not installed; using CSV instead of parquet")
+            file_format = 'csv'
+        
+        # Swap or add the extension
+        stem = filename
+        for ext in ('.csv', '.parquet'):
+            if stem.endswith(ext):
+                stem = stem[:-len(ext)]
+        return f"{stem}.{file_format}", file_format
+    
     def list_csv_files(self) -> List[str]:
         """
         List all CSV files in the data folder.
@@ -169,22 +227,23 @@ class DataHandler:
             List of CSV filenames
         """
         try:
-            csv_files = [f.name for f in self.data_folder.glob("*.csv")]
+            # scandir's entries know their type, so this needs no extra stat per file
+            try:
+                with os.scandir(self.data_folder) as entries:
+                    csv_files = [e.name for e in entries if e.is_file(follow_symlinks=False) and e.name.endswith('.csv')]
+            except FileNotFoundError:
+                csv_files = []  # folder is only created on first save
             
-            if csv_files:
-                print(f"📁 Found {len(csv_files)} CSV files:")
-                for i, file in enumerate(csv_files, 1):
-                    print(f"   {i}. {file}")
-            else:
-                print("📁 No CSV files found in data folder")
+            # One summary line; the data folder can hold thousands of symbol files
+            logger.info("📁 Found %d CSV files in %s", len(csv_files), self.data_folder)
             
             return csv_files
             
         except Exception as e:
-            print(f"❌ Error listing files: {e}")
+            logger.error("❌ Error listing files: %s", e)
             return []
     
-    def get_file_info(self, filename: str) -> dict:
+    def get_file_info(self, filename: str, include_sample: bool = False) -> dict:
         """
         Get basic information about a CSV file.
         
@@ -192,6 +251,8 @@ class DataHandler:
         -----------
         filename : str
             Name of the CSV file
+        include_sample : bool, optional
+            Also read the first rows for data types and sample data (default: False - header only)
         
         Returns:
         --------
@@ -204,24 +265,27 @@ class DataHandler:
             
             file_path = self.data_folder / filename
             
-            if not file_path.exists():
+            # Get file stats (one call; also tells us whether the file exists)
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
                 return {"error": "File not found"}
             
-            # Get file stats
-            stat = file_path.stat()
-            
-            # Load just the first few rows to get column info
-            df_sample = pd.read_csv(file_path, nrows=5)
+            # Header only for column info
+            columns = list(pd.read_csv(file_path, nrows=0).columns)
             
             info = {
                 "filename": filename,
                 "file_size_mb": round(stat.st_size / (1024 * 1024), 2),
-                "columns": list(df_sample.columns),
-                "num_columns": len(df_sample.columns),
-                "data_types": df_sample.dtypes.to_dict(),
-                "sample_data": df_sample.head(3).to_dict('records')
+                "columns": columns,
+                "num_columns": len(columns)
             }
             
+            if include_sample:
+                df_sample = pd.read_csv(file_path, nrows=3)
+                info["data_types"] = df_sample.dtypes.to_dict()
+                info["sample_data"] = df_sample.to_dict('records')
+            
             return info
             
         except Exception as e:
@@ -247,26 +311,32 @@ class DataHandler:
         Union[List[pd.DataFrame], pd.DataFrame]
             List of DataFrames or single concatenated DataFrame
         """
-        dataframes = []
-        
-        for filename in filenames:
-            df = self.load_csv(filename)
-            if not df.empty:
-                dataframes.append(df)
+        # Parsing releases the GIL, so files are read in parallel; map() keeps the input order
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            dataframes = [df for df in executor.map(self.load_csv, filenames) if not df.empty]
         
         if concat and dataframes:
             try:
                 combined_df = pd.concat(dataframes, ignore_index=True)
-                print(f"✅ Combined {len(dataframes)} files into single DataFrame")
-                print(f"   Final shape: {combined_df.shape}")
+                logger.info("✅ Combined %d files into single DataFrame, shape %s", len(dataframes), combined_df.shape)
                 return combined_df
             except Exception as e:
-                print(f"❌ Error combining DataFrames: {e}")
+                logger.error("❌ Error combining DataFrames: %s", e)
                 return dataframes
         
         return dataframes
 
 # Convenience functions for direct import
+
+# One DataHandler per data folder, shared by the convenience functions below
+_handlers = {}
+
+def _get_handler(data_folder: str) -> DataHandler:
+    """Return the shared DataHandler for `data_folder`, creating it on first use."""
+    if data_folder not in _handlers:
+        _handlers[data_folder] = DataHandler(data_folder)
+    return _handlers[data_folder]
+
 def load_csv(filename: str, data_folder: str = "data", **kwargs) -> pd.DataFrame:
     """
     Quick function to load a CSV file with automatic project root detection.
@@ -285,7 +355,7 @@ def load_csv(filename: str, data_folder: str = "data", **kwargs) -> pd.DataFrame
     pd.DataFrame
         The loaded DataFrame
     """
-    handler = DataHandler(data_folder)
+    handler = _get_handler(data_folder)
     return handler.load_csv(filename, **kwargs)
 
 def save_csv(df: pd.DataFrame, filename: str, data_folder: str = "data", **kwargs) -> bool:
@@ -308,7 +378,7 @@ def save_csv(df: pd.DataFrame, filename: str, data_folder: str = "data", **kwarg
     bool
         True if successful, False otherwise
     """
-    handler = DataHandler(data_folder)
+    handler = _get_handler(data_folder)
     return handler.save_csv(df, filename, **kwargs)
 
 def get_project_root() -> Path:
@@ -320,22 +390,12 @@ def get_project_root() -> Path:
     Path
         Path to the project root directory
     """
-    current_dir = Path(__file__).parent
-    project_root = current_dir.parent
-    
-    # Look for common project files to identify root
-    markers = ['main.py', 'setup.py', '.git', 'requirements.txt', 'pyproject.toml', 'README.md']
-    
-    while project_root != project_root.parent:
-        if any((project_root / marker).exists() for marker in markers):
-            return project_root
-        project_root = project_root.parent
-    
-    # Fallback to parent directory of this module
-    return Path(__file__).parent.parent
+    return _find_root(Path(__file__).parent.parent)
 
 # Example usage and testing
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Create a DataHandler instance
     handler = DataHandler("data")
     
@@ -359,47 +419,144 @@ if __name__ == "__main__":
         print("No CSV files found. Please add some CSV files to the 'data' folder.")
 
 # For saving historical data
+
+# Bar CSV column order: date, time, standard OHLCV, then extras
+_BAR_COLS = ('date', 'time', 'open', 'high', 'low', 'close', 'volume', 'trade_count', 'vwap')
+_BAR_COLS_SET = frozenset(_BAR_COLS)
+
+# 'HH:MM:00' for every minute of the day, indexed by minutes since midnight (bars start on whole minutes)
+_MINUTE_OF_DAY = np.array([f"{m // 60:02d}:{m % 60:02d}:00" for m in range(1440)])
+
+# File path -> (first, last) bar key saved in it; read from the file once, then kept up to date.
+# Keys are NY wall-clock times as int64 nanoseconds, i.e. the file's date + time columns as one number.
+_saved_spans = {}
+
+
+# Key given to rows whose date/time don't parse (NaT's int64 value)
+_NO_KEY = np.iinfo(np.int64).min
+
+
+def _bar_keys(dates, times) -> np.ndarray:
+    """
+    int64 key per row from 'YYYY-MM-DD' date and 'HH:MM:SS' time strings. Rows that don't parse,
+    such as a last line cut short when the program was killed mid-append, get _NO_KEY.
+    """
+    stamps = pd.to_datetime(dates + ' ' + times, format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    return stamps.to_numpy(dtype='datetime64[ns]').view('int64')
+
+
+def _end_last_line(file_path):
+    """Add a newline if the file was cut off mid-line, so appended rows don't run into the partial one."""
+    with open(file_path, 'rb+') as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return  # empty file
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+
 def save_bars_to_csv(df, symbol, data_dir):
     """
     Save bars DataFrame to CSV. Handles MultiIndex from Alpaca-py.
     Adds 'date' and 'time' columns. Appends to existing CSV if it exists.
+    Chunks arrive newest first, so the file is out of order until compact_bars_csv() runs.
+    The downloader fills each file as one unbroken range, so bars inside the range already
+    saved are skipped instead of written twice.
     """
     if df.empty:
         return
 
-    df = df.copy()
-
     # Handle MultiIndex: extract 'timestamp' level if exists
     if isinstance(df.index, pd.MultiIndex):
         if 'timestamp' in df.index.names:
-            df.index = df.index.get_level_values('timestamp')
+            idx = df.index.get_level_values('timestamp')
         else:
             # fallback: use last level as datetime
-            df.index = df.index.get_level_values(-1)
+            idx = df.index.get_level_values(-1)
+    else:
+        idx = df.index
+
+    # Convert timestamps to New York time (fetch_1min_bars_batch already does, then this is skipped)
+    if str(idx.tz) != str(NY_TZ):
+        idx = idx.tz_convert(NY_TZ)
+    wall_clock = idx.tz_localize(None)
+    keys = wall_clock.as_unit('ns').asi8  # same int64 keys _bar_keys() builds from the CSV
 
-    # Convert timestamps to New York time
-    df.index = df.index.tz_convert(NY_TZ)
+    # Date and time columns without a Python date/time object per row: midnight-only datetimes are written
+    # as YYYY-MM-DD, and the time text comes from a lookup by minute of the day
+    day = wall_clock.normalize()
+    minutes, seconds = np.divmod((keys - day.as_unit('ns').asi8) // 1_000_000_000, 60)
+    times = _MINUTE_OF_DAY[minutes] if not seconds.any() else wall_clock.strftime('%H:%M:%S')
 
-    # Extract date and time columns
-    df['date'] = df.index.date
-    df['time'] = df.index.time
+    # Reset index for CSV; set_axis/assign build a new frame, so the caller's DataFrame is left untouched
+    df = df.set_axis(idx).assign(date=day, time=times).reset_index()
 
-    # Reset index for CSV
-    df.reset_index(drop=False, inplace=True)
+    # Column order for the CSV: date, time, standard OHLCV, then extras; to_csv writes them in this
+    # order, so the frame itself isn't rebuilt just to reorder it
+    columns = [*_BAR_COLS, *(c for c in df.columns if c not in _BAR_COLS_SET)]
 
-    # Reorder columns: date, time, standard OHLCV, then extras
-    cols = ['date', 'time', 'open', 'high', 'low', 'close', 'volume','trade_count','vwap']
-    extra_cols = [c for c in df.columns if c not in cols]
-    df = df[cols + extra_cols]
+    # Prices to 4 decimals (sub-penny quotes need no more) and counts as ints; rounding rather than
+    # float_format keeps short values like 10.5 short, and float64 since float32 loses decimals on large prices
+    df[['open', 'high', 'low', 'close', 'vwap']] = df[['open', 'high', 'low', 'close', 'vwap']].round(4)
+    df[['volume', 'trade_count']] = df[['volume', 'trade_count']].round().astype('Int64')
 
     # CSV file path
     file_path = os.path.join(data_dir, f"{symbol}.csv")
 
-    # Append to existing CSV without duplicates
-    if os.path.exists(file_path):
-        existing_df = pd.read_csv(file_path)
-        df = pd.concat([existing_df, df])
-        df = df.drop_duplicates(subset=['date', 'time']).sort_values(['date', 'time'])
+    # Drop bars the file already has (e.g. a chunk downloaded again after an interrupted run)
+    span = _saved_spans.get(file_path)
+    if span is None and os.path.exists(file_path):
+        _end_last_line(file_path)
+        # Only the key columns, as plain text: no type inference over the OHLCV columns
+        saved = pd.read_csv(file_path, usecols=['date', 'time'], dtype=str, engine='c')
+        saved_keys = _bar_keys(saved['date'], saved['time'])
+        saved_keys = saved_keys[saved_keys != _NO_KEY]
+        if saved_keys.size:
+            span = (saved_keys.min(), saved_keys.max())
+    if span is not None:
+        new = (keys < span[0]) | (keys > span[1])
+        df, keys = df[new], keys[new]
+        if df.empty:
+            logger.debug("%s bars already saved in %s", symbol, file_path)
+            return
+        span = (min(span[0], keys.min()), max(span[1], keys.max()))
+    else:
+        span = (keys.min(), keys.max())
+
+    # Append only the new rows; rewriting the whole file for every chunk gets slower as history grows
+    df.to_csv(file_path, mode='a', header=not os.path.exists(file_path), index=False, columns=columns)
+    _saved_spans[file_path] = span
+    logger.debug("Saved %s bars to %s", symbol, file_path)
+
+
+def compact_bars_csv(symbol, data_dir):
+    """
+    Sort a symbol's bar CSV by date and time and drop duplicate bars
+    (e.g. a chunk written again after an interrupted run). Run once a symbol is fully downloaded.
+    """
+    file_path = os.path.join(data_dir, f"{symbol}.csv")
+    if not os.path.exists(file_path):
+        return
+
+    # Read everything as text so values are written back exactly as they were
+    df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    if df.empty:
+        return
+
+    # Drop rows whose date/time don't parse (e.g. a line cut short by a hard kill)
+    keys = _bar_keys(df['date'], df['time'])
+    valid = keys != _NO_KEY
+    df, keys = df[valid], keys[valid]
+
+    # Sort on the int64 keys (stable, so the first-written copy of a bar comes first), then keep only
+    # rows whose key differs from the one before: no hashing or comparing of date/time strings
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    first = np.ones(len(sorted_keys), dtype=bool)
+    first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    df = df.iloc[order[first]]
 
-    df.to_csv(file_path, index=False)
-    print(f"Saved {symbol} bars to {file_path}")
+    # Write a temp file and swap it in so an interrupted compaction can't lose bars
+    tmp_path = file_path + ".tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
+    logger.debug("Compacted %s bars in %s", symbol, file_path)
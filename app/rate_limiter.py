@@ -0,0 +1,131 @@
+# Client side pacing of Alpaca API requests
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+THROTTLE_STATUS_CODES = (429, 502)
+
+
+class RateLimiter:
+    """
+    Thread-safe pacer shared by every request sent to the Alpaca data API.
+
+    - Sliding window: never sends more than `requests_per_minute` requests in any 60 seconds.
+    - Header driven: reads X-RateLimit-Remaining / X-RateLimit-Reset from each response and
+      pauses until the reset time once less than `low_water` of the quota is left.
+    - AIMD: the number of requests allowed in flight grows by `increase` after each success
+      and is multiplied by `decrease` after a 429/502 response.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 200,
+        max_concurrency: int = 8,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        low_water: float = 0.1
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.low_water = low_water
+        self.concurrency = float(max_concurrency)
+
+        self._sent = deque()        # time.monotonic() of each request in the last minute
+        self._in_flight = 0
+        self._paused_until = 0.0    # time.monotonic() value
+        self._cond = threading.Condition()
+
+    def wait_if_throttled(self):
+        """Block until a request may be sent, then reserve a slot for it."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0] >= 60:
+                    self._sent.popleft()
+
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif len(self._sent) >= self.requests_per_minute:
+                    delay = 60 - (now - self._sent[0])
+                elif self._in_flight >= max(1, int(self.concurrency)):
+                    delay = None  # woken up by release()
+                else:
+                    break
+                self._cond.wait(delay)
+
+            self._sent.append(now)
+            self._in_flight += 1
+
+    def release(self, response: Optional[Response] = None):
+        """Free the slot taken by wait_if_throttled() and adjust pacing from the response."""
+        with self._cond:
+            self._in_flight -= 1
+            if response is not None:
+                if response.status_code in THROTTLE_STATUS_CODES:
+                    self.concurrency = max(1.0, self.concurrency * self.decrease)
+                else:
+                    self.concurrency = min(float(self.max_concurrency), self.concurrency + self.increase)
+                self._read_headers(response)
+            self._cond.notify_all()
+
+    def _read_headers(self, response: Response):
+        """Pause until the quota resets when the server says we're nearly out of requests."""
+        try:
+            limit = int(response.headers["X-RateLimit-Limit"])
+            remaining = int(response.headers["X-RateLimit-Remaining"])
+            reset = float(response.headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+
+        if remaining < limit * self.low_water:
+            pause = max(0.0, reset - time.time())
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """requests adapter that sends every request (including each page of a paginated call) through a RateLimiter."""
+
+    def __init__(self, limiter: RateLimiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.limiter.wait_if_throttled()
+        response = None
+        try:
+            response = super().send(request, **kwargs)
+            return response
+        finally:
+            self.limiter.release(response)
+
+
+def retry_after_seconds(error: Exception, default: float) -> float:
+    """
+    Seconds the server asked us to wait before retrying after `error`.
+    Uses the Retry-After header, or X-RateLimit-Reset on a 429; otherwise returns `default`.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return default
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+
+    reset = response.headers.get("X-RateLimit-Reset")
+    if response.status_code == 429 and reset is not None:
+        try:
+            return max(0.0, float(reset) - time.time())
+        except ValueError:
+            pass
+
+    return default
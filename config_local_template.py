@@ -7,4 +7,9 @@ MAX_RETRIES = 5
 RETRY_DELAY = 10  # seconds between retries
 CHUNK_DAYS = 90  # The number of days to get per symbol per loop, the code starts with most recent data, gets this number of days,
                  # when finished with all symbols, it will loop again with the next chunk of days
-NY_TZ = "America/New_York"  # Timezone for New York
\ No newline at end of file
+NY_TZ = "America/New_York"  # Timezone for New York
+DOWNLOAD_WORKERS = 8  # number of symbols downloaded at the same time, the free Alpaca plan allows 200 requests per minute
+                      # so raising this much higher only makes the workers wait on each other
+REQUESTS_PER_MINUTE = 200  # Alpaca API request limit for your plan (200 for the free plan)
+SYMBOLS_PER_REQUEST = 10  # symbols fetched together in one API request, saves requests on thinly traded symbols
+                          # but every worker holds a whole batch in memory, so keep it modest
@@ -1,9 +1,13 @@
+import logging
+
 from app.alpaca_client import connect_trading, get_recent_bars, get_tradeable_symbols_df, download_all_symbols
 from app.data_handler import DataHandler
-
-# from app.data_handler.py import get_available_symbols
+from config_local import BASE_DATA_DIR
 
 def main():
+    # Plain messages like the rest of the output; per-file DataHandler messages are DEBUG and stay hidden
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     trading_client = connect_trading()
 
     # Example: get account info
@@ -23,9 +27,10 @@ def main():
         print("\nFirst 10 symbols:")
         print(symbols_df.head(10))
         
-        # Save to CSV for future reference
-        symbols_df.to_csv('alpaca_tradeable_symbols.csv', index=False)
-        print("✅ Symbols saved to alpaca_tradeable_symbols.csv")
+        # Save to CSV for future reference, next to the downloaded data rather than in the working directory
+        handler = DataHandler(BASE_DATA_DIR)
+        if handler.save_csv(symbols_df, 'alpaca_tradeable_symbols'):
+            print(f"✅ Symbols saved to {handler.data_folder / 'alpaca_tradeable_symbols.csv'}")
     else:
         print("❌ No symbols retrieved")   
 